@@ -17,13 +17,14 @@ Extension notes:
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import os
+import shutil
 from werkzeug.utils import secure_filename
-import csv
-from io import StringIO
+import json
+import re
 
 from detector import detect_attack
 from data_ingestion import DataIngestion
-from database import Database
+from database import Database, DatabaseBusyError, DETECTION_FIELDS
 
 app = Flask(__name__)
 CORS(app)
@@ -33,6 +34,7 @@ ALLOWED_EXTENSIONS = {'csv', 'pcap'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+UPLOAD_COPY_BUFFER = 1 << 20  # block size when copying PCAP uploads to disk
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -40,10 +42,35 @@ data_ingestion = DataIngestion()
 db = Database()
 
 
+# Rows per chunk of the streamed CSV export
+CSV_CHUNK_ROWS = 256
+# Maximum page size of GET /api/detections when a client asks for paging
+DETECTIONS_MAX_PAGE_SIZE = 5000
+CSV_HEADER = ','.join(DETECTION_FIELDS) + '\r\n'
+# Characters that force a CSV field to be quoted (same rule as csv.QUOTE_MINIMAL)
+_CSV_SPECIAL = re.compile(r'[",\r\n]')
+
+
+def _csv_field(value) -> str:
+    """Format one CSV field; only fields containing a delimiter, quote or newline are quoted."""
+    if value is None:
+        return ''
+    text = str(value)
+    if _CSV_SPECIAL.search(text):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@app.errorhandler(DatabaseBusyError)
+def database_busy(e):
+    """All pooled read connections stayed in use; the client may retry shortly."""
+    return jsonify({'error': 'Database is busy, please retry'}), 503, {'Retry-After': '1'}
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'URL Intrusion Detection System API is running'})
@@ -62,23 +89,36 @@ def upload_file():
         return jsonify({'error': 'Invalid file type. Only CSV and PCAP files are allowed'}), 400
 
     filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    filepath = None
 
     try:
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        urls = data_ingestion.process_file(filepath, file_extension)
+        if file_extension == 'csv':
+            # CSV is parsed straight from the upload stream; nothing is written to disk
+            urls = data_ingestion.process_csv_upload(file.stream)
+        else:
+            # PCAP parsing needs a file; copy the upload to disk in large blocks
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            with open(filepath, 'wb', buffering=UPLOAD_COPY_BUFFER) as f:
+                shutil.copyfileobj(file.stream, f, UPLOAD_COPY_BUFFER)
+            urls = data_ingestion.process_file(filepath, file_extension)
 
         results = []
-        # Insert file analysis first so we can link each detection to this file (analyst context)
-        file_analysis_id = db.insert_file_analysis(filename, file_extension, 0)
+        total_urls = 0
+        # detect_attack depends only on the URL, so each distinct URL in the file is analyzed once
+        verdicts = {}
+        # URLs are streamed from the file; detection runs as each one is parsed
         for url_data in urls:
+            total_urls += 1
             url = url_data.get('url', '')
             source_ip = url_data.get('source_ip', 'Unknown')
             timestamp = url_data.get('timestamp', '')
 
             # One URL -> one detection (priority-based) — detection logic unchanged
-            detection = detect_attack(url)
+            if url in verdicts:
+                detection = verdicts[url]
+            else:
+                detection = verdicts[url] = detect_attack(url)
             if detection:
                 result = {
                     'url': url,
@@ -89,26 +129,23 @@ def upload_file():
                     'confidence_score': detection.get('confidence_score'),
                 }
                 results.append(result)
-                db.insert_detection(result, file_analysis_id=file_analysis_id)
 
-        # Update file_analysis with final attack count (we inserted with 0 initially)
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE file_analysis SET total_attacks_detected = ? WHERE id = ?', (len(results), file_analysis_id))
-        conn.commit()
+        # Insert file analysis once parsing succeeded so each detection links to this file (analyst context);
+        # both inserts are committed together
+        with db.transaction():
+            file_analysis_id = db.insert_file_analysis(filename, file_extension, len(results))
+            db.insert_detections_bulk(results, file_analysis_id=file_analysis_id)
 
         return jsonify({
             'message': 'File processed successfully',
-            'total_urls': len(urls),
+            'total_urls': total_urls,
             'detected_attacks': len(results),
             'results': results,
         }), 200
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
         return jsonify({'error': f'Error processing file: {str(e)}'}), 500
     finally:
-        if os.path.exists(filepath):
+        if filepath and os.path.exists(filepath):
             try:
                 os.remove(filepath)
             except OSError:
@@ -121,8 +158,22 @@ def get_detections():
     source_ip = request.args.get('source_ip', None)
     file_id = request.args.get('file_id', type=int)
     severity = request.args.get('severity', None)
-    detections = db.get_detections(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
-    return jsonify({'total': len(detections), 'detections': detections}), 200
+    # Optional paging: with `limit`, one page of at most that many rows is
+    # returned; without it, every matching detection (as the dashboard expects).
+    # `total` always counts all matching detections.
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), DETECTIONS_MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    filters = dict(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
+    detections = db.get_detections(limit=limit, offset=offset, **filters)
+    if limit is None and not offset:
+        # Every match is already in the list: no second COUNT(*) query, and
+        # total cannot disagree with it if a write lands in between
+        total = len(detections)
+    else:
+        total = db.count_detections(**filters)
+    return jsonify({'total': total, 'limit': limit, 'offset': offset, 'detections': detections}), 200
 
 
 @app.route('/api/statistics', methods=['GET'])
@@ -165,17 +216,26 @@ def export_csv():
     source_ip = request.args.get('source_ip', None)
     file_id = request.args.get('file_id', type=int)
     severity = request.args.get('severity', None)
-    detections = db.get_detections(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
-
-    output = StringIO()
-    if detections:
-        writer = csv.DictWriter(output, fieldnames=detections[0].keys(), extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows(detections)
+    detections = db.iter_detections(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
+
+    def generate():
+        # Rows are streamed as they are read from SQLite, a few hundred lines per chunk.
+        # The header is only written when there is at least one row.
+        lines = []
+        header_written = False
+        for detection in detections:
+            if not header_written:
+                lines.append(CSV_HEADER)
+                header_written = True
+            lines.append(','.join([_csv_field(detection.get(f)) for f in DETECTION_FIELDS]) + '\r\n')
+            if len(lines) >= CSV_CHUNK_ROWS:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
 
-    output.seek(0)
     return Response(
-        output.getvalue(),
+        generate(),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=detections.csv'}
     )
@@ -187,8 +247,18 @@ def export_json():
     source_ip = request.args.get('source_ip', None)
     file_id = request.args.get('file_id', type=int)
     severity = request.args.get('severity', None)
-    detections = db.get_detections(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
-    return jsonify({'total': len(detections), 'detections': detections}), 200
+    detections = db.iter_detections(attack_type=attack_type, source_ip=source_ip, file_id=file_id, severity=severity)
+
+    def generate():
+        # Same document as before ({"total", "detections"}), emitted row by row; total comes last
+        total = 0
+        yield '{"detections": ['
+        for detection in detections:
+            yield (', ' if total else '') + json.dumps(detection)
+            total += 1
+        yield f'], "total": {total}}}'
+
+    return Response(generate(), mimetype='application/json')
 
 
 if __name__ == '__main__':
@@ -4,7 +4,6 @@ import sys
 REQUIRED = [
     ('flask', 'Flask'),
     ('flask_cors', 'Flask-CORS'),
-    ('pandas', 'pandas'),
     ('scapy', 'scapy'),
     ('dotenv', 'python-dotenv'),
 ]
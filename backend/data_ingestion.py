@@ -1,15 +1,193 @@
-import pandas as pd
-from scapy.all import rdpcap, IP, TCP, Raw
-from typing import List, Dict
+import csv
+import functools
+import io
+import itertools
+import socket
+import struct
+from scapy.all import PcapReader, IP, TCP, Raw
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import re
 
+# Read buffer for uploaded CSV logs; large sequential reads keep syscalls low.
+CSV_READ_BUFFER = 1 << 20
+
+# Common column names for URLs, source IPs and timestamps in log files
+URL_COLUMNS = ['url', 'URL', 'request', 'Request', 'path', 'Path', 'uri', 'URI']
+IP_COLUMNS = ['ip', 'IP', 'source_ip', 'Source IP', 'client_ip', 'Client IP', 'src_ip']
+TIME_COLUMNS = ['timestamp', 'Timestamp', 'time', 'Time', 'date', 'Date']
+
+# URL extraction patterns, compiled once for the per-row / per-packet hot path
+HTTP_RE = re.compile(r'https?://[^\s<>"\'{}|\\^`\[\]]+')
+PATH_RE = re.compile(r'/[^\s<>"\'{}|\\^`\[\]]*')
+# HTTP request line at the start of a raw TCP payload; the separator may not
+# cross into the next header line
+REQUEST_LINE_RE = re.compile(rb'^(GET|POST|PUT|DELETE|HEAD|OPTIONS)[^\S\n]+(\S+)')
+# First bytes of the methods above; anything else cannot be an HTTP request
+HTTP_METHOD_INITIALS = frozenset(b'GPDHO')
+
+# Classic pcap decoding. Magic number -> (byte order, timestamp fraction digits)
+PCAP_READ_BUFFER = 1 << 20
+_PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 6),  # microsecond timestamps
+    b'\xa1\xb2\xc3\xd4': ('>', 6),
+    b'\x4d\x3c\xb2\xa1': ('<', 9),  # nanosecond timestamps
+    b'\xa1\xb2\x3c\x4d': ('>', 9),
+}
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+_SUPPORTED_LINKTYPES = {LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL, LINKTYPE_IPV4}
+ETHERTYPE_IPV4 = 0x0800
+_VLAN_ETHERTYPES = {0x8100, 0x88A8}
+IPPROTO_TCP = 6
+
+
+# (timestamp, source_ip, url) as produced by process_file_tuples
+UrlRow = Tuple[str, str, str]
+
+
+def _url_record(row: UrlRow) -> Dict:
+    timestamp, source_ip, url = row
+    return {
+        'url': url,
+        'source_ip': source_ip,
+        'timestamp': timestamp
+    }
+
+
+def _first_present(candidates: List[str], columns: List[str]) -> Optional[str]:
+    """Return the first candidate column name present in the CSV header."""
+    present = set(columns)
+    for col in candidates:
+        if col in present:
+            return col
+    return None
+
+
+def _open_pcap_frames(f: BinaryIO, filepath: str) -> Tuple[Iterator[Tuple[bytes, Any]],
+                                                         Callable[[Any], Tuple[str, str]]]:
+    """
+    Pick the frame decoder for a capture and return (frames, describe).
+
+    frames yields (tcp_payload, origin) for IPv4/TCP packets; describe(origin)
+    returns (timestamp, source_ip). Formatting the timestamp and address is
+    deferred so it is only paid for packets that turn out to be HTTP requests.
+    Classic libpcap files are decoded directly from the frame bytes; anything
+    else (e.g. pcapng, unusual link types) falls back to Scapy.
+    """
+    header = f.read(24)
+    fmt = _PCAP_MAGIC.get(header[:4])
+    if fmt is not None and len(header) == 24:
+        endian, frac_digits = fmt
+        linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+        if linktype in _SUPPORTED_LINKTYPES:
+            frames = _iter_pcap_records(f, struct.Struct(endian + 'IIII'), linktype)
+            return frames, functools.partial(_describe_pcap_origin, frac_digits)
+    return _iter_scapy_tcp_payloads(filepath), _describe_scapy_packet
+
+
+def _iter_pcap_records(f: BinaryIO, record_header: struct.Struct,
+                       linktype: int) -> Iterator[Tuple[bytes, Tuple[int, int, bytes]]]:
+    """
+    Yield (tcp_payload, (ts_sec, ts_frac, raw_src_ip)) for IPv4/TCP records. Every
+    other frame (ARP, IPv6, UDP, ICMP, non-first fragments) is skipped from its
+    header bytes alone.
+    """
+    read = f.read
+    header_size = record_header.size
+    while True:
+        rec = read(header_size)
+        if len(rec) < header_size:
+            return
+        ts_sec, ts_frac, incl_len, _ = record_header.unpack(rec)
+        frame = read(incl_len)
+        if len(frame) < incl_len:
+            return
+
+        # Link layer -> offset of the IP header
+        if linktype == LINKTYPE_ETHERNET:
+            if len(frame) < 14:
+                continue
+            ethertype = (frame[12] << 8) | frame[13]
+            off = 14
+            while ethertype in _VLAN_ETHERTYPES and len(frame) >= off + 4:
+                ethertype = (frame[off + 2] << 8) | frame[off + 3]
+                off += 4
+            if ethertype != ETHERTYPE_IPV4:
+                continue
+        elif linktype == LINKTYPE_LINUX_SLL:
+            if len(frame) < 16 or ((frame[14] << 8) | frame[15]) != ETHERTYPE_IPV4:
+                continue
+            off = 16
+        else:
+            off = 0
+
+        # IPv4 header: version 4, protocol TCP, not a trailing fragment
+        if len(frame) < off + 20 or frame[off] >> 4 != 4 or frame[off + 9] != IPPROTO_TCP:
+            continue
+        if ((frame[off + 6] << 8) | frame[off + 7]) & 0x1FFF:
+            continue
+        ihl = (frame[off] & 0x0F) * 4
+        total_len = (frame[off + 2] << 8) | frame[off + 3]
+        # Ethernet padding lies beyond the IP total length; 0 means length offloaded (TSO)
+        ip_end = off + total_len if total_len else len(frame)
+
+        tcp_off = off + ihl
+        if len(frame) < tcp_off + 20:
+            continue
+        payload = frame[tcp_off + (frame[tcp_off + 12] >> 4) * 4:ip_end]
+        yield payload, (ts_sec, ts_frac, frame[off + 12:off + 16])
+
+
+def _describe_pcap_origin(frac_digits: int, origin: Tuple[int, int, bytes]) -> Tuple[str, str]:
+    ts_sec, ts_frac, raw_src = origin
+    return f"{ts_sec}.{ts_frac:0{frac_digits}d}", socket.inet_ntoa(raw_src)
+
+
+def _iter_scapy_tcp_payloads(filepath: str) -> Iterator[Tuple[bytes, Any]]:
+    """Fallback for captures the direct decoder does not handle (e.g. pcapng)."""
+    # PcapReader reads and dissects one packet at a time instead of
+    # loading the whole capture into memory like rdpcap
+    with PcapReader(filepath) as packets:
+        for packet in packets:
+            # Packets with IP and TCP layers that carry data
+            if IP in packet and TCP in packet and Raw in packet:
+                yield packet[Raw].load, packet
+
+
+def _describe_scapy_packet(packet) -> Tuple[str, str]:
+    return str(packet.time), packet[IP].src
+
+
+class _RawStreamReader(io.RawIOBase):
+    """
+    Raw binary reader over any object with read(n), so it can sit under
+    io.TextIOWrapper. Werkzeug buffers uploads in a SpooledTemporaryFile,
+    which lacks readable() and the rest of the io interface before Python 3.11.
+    Closing the reader leaves the wrapped stream open.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._stream.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+
 class DataIngestion:
     """Handles ingestion and parsing of CSV and PCAP files"""
     
     def __init__(self):
         pass
     
-    def process_file(self, filepath: str, file_type: str) -> List[Dict]:
+    def process_file(self, filepath: str, file_type: str) -> Iterator[Dict]:
         """
         Process uploaded file and extract URLs
         
@@ -18,7 +196,15 @@ class DataIngestion:
             file_type: Type of file ('csv' or 'pcap')
             
         Returns:
-            List of dictionaries containing URL data
+            Iterator of dictionaries containing URL data. URLs are produced
+            lazily, so the file is read while the caller consumes them.
+        """
+        return map(_url_record, self.process_file_tuples(filepath, file_type))
+
+    def process_file_tuples(self, filepath: str, file_type: str) -> Iterator[UrlRow]:
+        """
+        Like process_file, but yield (timestamp, source_ip, url) tuples instead
+        of dicts, for callers that walk every row and don't need the keys.
         """
         if file_type == 'csv':
             return self._process_csv(filepath)
@@ -27,136 +213,110 @@ class DataIngestion:
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     
-    def _process_csv(self, filepath: str) -> List[Dict]:
-        """Extract URLs from CSV log file"""
-        urls = []
-        
+    def process_csv_stream(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """
+        Extract URLs from CSV text that is already open, e.g. the decoded lines
+        of an upload's request stream, so no temporary file is needed. Lines
+        must keep their line endings (as with open(..., newline='')).
+        """
         try:
-            # Try to read CSV with common delimiters
-            df = pd.read_csv(filepath)
-            
-            # Common column names for URLs in log files
-            url_columns = ['url', 'URL', 'request', 'Request', 'path', 'Path', 'uri', 'URI']
-            ip_columns = ['ip', 'IP', 'source_ip', 'Source IP', 'client_ip', 'Client IP', 'src_ip']
-            time_columns = ['timestamp', 'Timestamp', 'time', 'Time', 'date', 'Date']
-            
-            url_col = None
-            ip_col = None
-            time_col = None
-            
-            # Find URL column
-            for col in url_columns:
-                if col in df.columns:
+            yield from map(_url_record, self._iter_csv_rows(lines))
+        except Exception as e:
+            raise Exception(f"Error processing CSV file: {str(e)}")
+
+    def process_csv_upload(self, stream: BinaryIO) -> Iterator[Dict]:
+        """
+        Extract URLs from a binary CSV upload stream (e.g. Flask's file.stream).
+        Decoded as UTF-8 (BOM tolerated); newline='' leaves line splitting
+        (\\n, \\r\\n or bare \\r) to the csv module, as for files on disk.
+        """
+        raw = io.BufferedReader(_RawStreamReader(stream), CSV_READ_BUFFER)
+        return self.process_csv_stream(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+
+    def _process_csv(self, filepath: str) -> Iterator[UrlRow]:
+        """Extract URLs from CSV log file, streaming one row at a time"""
+        try:
+            with open(filepath, 'r', newline='', encoding='utf-8-sig', buffering=CSV_READ_BUFFER) as f:
+                yield from self._iter_csv_rows(f)
+        except Exception as e:
+            raise Exception(f"Error processing CSV file: {str(e)}")
+
+    def _iter_csv_rows(self, f: Iterable[str]) -> Iterator[UrlRow]:
+        """Yield URL rows from CSV text, resolving the URL/IP/time columns from the header"""
+        # Plain csv.reader with column positions avoids building a dict per row
+        reader = csv.reader(f)
+        columns = next(reader, None) or []
+        # Name -> position; a repeated name maps to its last column, as with DictReader
+        position = {col: i for i, col in enumerate(columns)}
+
+        # Resolve columns once from the header (first candidate present wins)
+        url_col = _first_present(URL_COLUMNS, columns)
+        ip_col = _first_present(IP_COLUMNS, columns)
+        time_col = _first_present(TIME_COLUMNS, columns)
+        ip_pos = position[ip_col] if ip_col else None
+        time_pos = position[time_col] if time_col else None
+
+        # Blank lines carry no fields and are skipped, as DictReader does
+        rows = filter(None, reader)
+
+        # If no URL column found, try to find URLs in any text column of the first row
+        if url_col is None:
+            first_row = next(rows, None)
+            if first_row is None:
+                return
+            for col in columns:
+                pos = position[col]
+                sample = first_row[pos] if pos < len(first_row) else ''
+                if 'http' in sample.lower() or '/' in sample:
                     url_col = col
                     break
-            
-            # Find IP column
-            for col in ip_columns:
-                if col in df.columns:
-                    ip_col = col
-                    break
-            
-            # Find timestamp column
-            for col in time_columns:
-                if col in df.columns:
-                    time_col = col
-                    break
-            
-            # If no URL column found, try to extract from other columns
-            if url_col is None:
-                # Try to find URLs in any text column
-                for col in df.columns:
-                    if df[col].dtype == 'object':  # String type
-                        sample = str(df[col].iloc[0]) if len(df) > 0 else ''
-                        if 'http' in sample.lower() or '/' in sample:
-                            url_col = col
-                            break
-            
-            # Extract URLs
-            if url_col:
-                for idx, row in df.iterrows():
-                    url = str(row[url_col]) if pd.notna(row[url_col]) else ''
-                    source_ip = str(row[ip_col]) if ip_col and pd.notna(row.get(ip_col, '')) else 'Unknown'
-                    timestamp = str(row[time_col]) if time_col and pd.notna(row.get(time_col, '')) else ''
-                    
-                    # Extract URL from full request if needed
-                    if url and ('http' in url.lower() or url.startswith('/')):
-                        # Clean and extract URL
-                        url = self._extract_url_from_string(url)
-                        if url:
-                            urls.append({
-                                'url': url,
-                                'source_ip': source_ip,
-                                'timestamp': timestamp
-                            })
+            rows = itertools.chain((first_row,), rows)
+        url_pos = position[url_col] if url_col else None
+        column_positions = [position[col] for col in columns]
+
+        # Extract URLs
+        for row in rows:
+            width = len(row)
+            source_ip = (row[ip_pos] if ip_pos is not None and ip_pos < width else '') or 'Unknown'
+            timestamp = row[time_pos] if time_pos is not None and time_pos < width else ''
+
+            if url_pos is not None:
+                url = row[url_pos] if url_pos < width else ''
+                # Extract URL from full request if needed
+                if url and ('http' in url.lower() or url.startswith('/')):
+                    url = self._extract_url_from_string(url)
+                    if url:
+                        yield timestamp, source_ip, url
             else:
                 # If no URL column found, try to extract from all columns
-                for idx, row in df.iterrows():
-                    for col in df.columns:
-                        value = str(row[col]) if pd.notna(row[col]) else ''
-                        url = self._extract_url_from_string(value)
-                        if url:
-                            source_ip = str(row[ip_col]) if ip_col and pd.notna(row.get(ip_col, '')) else 'Unknown'
-                            timestamp = str(row[time_col]) if time_col and pd.notna(row.get(time_col, '')) else ''
-                            urls.append({
-                                'url': url,
-                                'source_ip': source_ip,
-                                'timestamp': timestamp
-                            })
-                            break
-            
-        except Exception as e:
-            raise Exception(f"Error processing CSV file: {str(e)}")
-        
-        return urls
-    
-    def _process_pcap(self, filepath: str) -> List[Dict]:
+                for pos in column_positions:
+                    url = self._extract_url_from_string(row[pos] if pos < width else '')
+                    if url:
+                        yield timestamp, source_ip, url
+                        break
+
+    def _process_pcap(self, filepath: str) -> Iterator[UrlRow]:
         """Extract HTTP URLs from PCAP file"""
-        urls = []
-        
         try:
-            packets = rdpcap(filepath)
-            
-            for packet in packets:
-                # Check if packet has IP and TCP layers
-                if IP in packet and TCP in packet:
-                    # Check if packet contains HTTP data
-                    if Raw in packet:
-                        payload = packet[Raw].load
-                        
-                        # Try to decode as HTTP request
-                        try:
-                            http_data = payload.decode('utf-8', errors='ignore')
-                            
-                            # Look for HTTP request lines
-                            if http_data.startswith(('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS')):
-                                # Extract URL from HTTP request
-                                lines = http_data.split('\n')
-                                if lines:
-                                    request_line = lines[0].strip()
-                                    # Extract URL from request line (e.g., "GET /path?query=value HTTP/1.1")
-                                    url_match = re.search(r'(GET|POST|PUT|DELETE|HEAD|OPTIONS)\s+([^\s]+)', request_line)
-                                    if url_match:
-                                        url = url_match.group(2)
-                                        
-                                        # Extract source IP
-                                        source_ip = packet[IP].src
-                                        
-                                        # Extract timestamp
-                                        timestamp = str(packet.time)
-                                        
-                                        urls.append({
-                                            'url': url,
-                                            'source_ip': source_ip,
-                                            'timestamp': timestamp
-                                        })
-                        except (UnicodeDecodeError, AttributeError):
-                            continue
-                            
+            with open(filepath, 'rb', buffering=PCAP_READ_BUFFER) as f:
+                frames, describe = _open_pcap_frames(f, filepath)
+
+                for payload, origin in frames:
+                    # Cheap first-byte check skips TLS, SSH, responses etc. before the regex
+                    if not payload or payload[0] not in HTTP_METHOD_INITIALS:
+                        continue
+
+                    # Match the HTTP request line (e.g. "GET /path?query=value HTTP/1.1")
+                    # directly on the raw bytes; only the URL itself is decoded
+                    url_match = REQUEST_LINE_RE.match(payload)
+                    if url_match:
+                        url = url_match.group(2).decode('utf-8', errors='ignore')
+                        # Source IP and timestamp are only formatted for matched requests
+                        timestamp, source_ip = describe(origin)
+                        yield timestamp, source_ip, url
+
         except Exception as e:
             raise Exception(f"Error processing PCAP file: {str(e)}")
-        
-        return urls
     
     def _extract_url_from_string(self, text: str) -> str:
         """Extract URL from a string that might contain other data"""
@@ -164,12 +324,12 @@ class DataIngestion:
             return ''
         
         # Look for HTTP/HTTPS URLs
-        http_match = re.search(r'https?://[^\s<>"\'{}|\\^`\[\]]+', text)
+        http_match = HTTP_RE.search(text)
         if http_match:
             return http_match.group(0)
         
         # Look for path-like URLs (starting with /)
-        path_match = re.search(r'/[^\s<>"\'{}|\\^`\[\]]*', text)
+        path_match = PATH_RE.search(text)
         if path_match:
             return path_match.group(0)
         
@@ -1,188 +1,478 @@
 """
 Database layer for URL Intrusion Detection System.
 
-Stores detection results and file analysis history. Uses one connection per thread
-(Flask multi-threaded). Schema supports confidence scores and file metadata for
-analyst usability; could be extended for SIEM integration (e.g. export to syslog).
+Stores detection results and file analysis history. Reads borrow a read-only
+connection from a small bounded pool (Flask multi-threaded); all writes go
+through a single shared writer connection guarded by a lock, which is the
+concurrency model WAL is built for (many readers, one writer). Schema
+supports confidence scores and file metadata for analyst usability; could be
+extended for SIEM integration (e.g. export to syslog).
 """
 
+import atexit
+import heapq
+import logging
+import os
+import queue
 import sqlite3
 import threading
-from typing import List, Dict, Optional
+import time
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Dict, Optional
 from datetime import datetime
 
+# Kept as one constant string: sqlite3 caches prepared statements per connection
+# by SQL text, so every insert on the long-lived writer reuses the same compiled
+# statement instead of re-parsing it.
+_INSERT_DETECTION_SQL = '''
+    INSERT INTO detections (file_analysis_id, url, source_ip, timestamp, attack_type, severity, pattern_matched, confidence_score)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Per-connection settings, applied to every connection when it is opened
+# (journal_mode=WAL is persistent in the database file and is set in init_db).
+_CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=536870912',  # 512MB memory-mapped reads
+    'PRAGMA cache_size=-65536',  # 64MB page cache
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Maximum number of open read connections (same default as ThreadPoolExecutor)
+READ_POOL_SIZE = min(32, (os.cpu_count() or 1) + 4)
+# Seconds to wait for a free read connection before giving up (HTTP 503)
+READ_POOL_TIMEOUT = 10.0
+# Rows per read of a streamed export; no connection is held between batches
+EXPORT_BATCH_ROWS = 1000
+
+# Background writes: up to WRITE_BATCH_SIZE queued detections, or whatever
+# arrived within WRITE_BATCH_WAIT seconds, are committed together
+WRITE_BATCH_SIZE = 100
+WRITE_BATCH_WAIT = 0.05
+
+# Minimum seconds between PRAGMA optimize runs (planner statistics refresh)
+OPTIMIZE_INTERVAL = 15 * 60
+
+# Seconds a get_statistics result is reused while no new detection arrives
+STATS_CACHE_TTL = 5.0
+# Expired statistics entries are pruned once the cache grows past this size
+STATS_CACHE_MAX_ENTRIES = 128
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseBusyError(RuntimeError):
+    """No pooled read connection became free within READ_POOL_TIMEOUT."""
+
+
 class Database:
     def __init__(self, db_path: str = 'detections.db'):
         self.db_path = db_path
-        self._local = threading.local()
+        # Idle read connections; LIFO so the most recently used (warm cache) is reused
+        self._read_pool = queue.LifoQueue()
+        self._read_pool_lock = threading.Lock()
+        self._read_conns_opened = 0
+        self._writer_conn = None
+        # Re-entrant so write helpers can run inside an enclosing transaction()
+        self._writer_lock = threading.RLock()
+        self._tx_depth = 0
+        self._tx_owner = None
+        # insert_detection rows waiting for the background writer (started on first use)
+        self._write_queue = queue.Queue()
+        self._writer_thread = None
+        self._writer_thread_lock = threading.Lock()
+        # First background write error since the last flush(), and the rows it lost
+        self._write_error: Optional[BaseException] = None
+        self._write_errors_lost = 0
+        self._last_optimize = time.monotonic()
+        # (file_id, severity) -> (expires_at, max detection id, statistics)
+        self._stats_cache: Dict[tuple, tuple] = {}
+        self._stats_lock = threading.Lock()
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, **kwargs)
+        conn.row_factory = sqlite3.Row
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrow a read-only connection from the pool for the duration of the block.
+
+        At most READ_POOL_SIZE connections are ever opened, however many threads
+        the server runs; when all are in use, callers wait for one to be returned,
+        and DatabaseBusyError is raised after READ_POOL_TIMEOUT seconds.
+        Pooled connections stay open, so the pragmas, page cache and statement
+        cache are set up once per connection rather than per request.
+        """
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._read_pool_lock:
+            can_open = self._read_conns_opened < READ_POOL_SIZE
+            if can_open:
+                self._read_conns_opened += 1
+        if not can_open:
+            try:
+                return self._read_pool.get(timeout=READ_POOL_TIMEOUT)
+            except queue.Empty:
+                raise DatabaseBusyError(
+                    f'No read connection became free within {READ_POOL_TIMEOUT:g}s') from None
+        try:
+            conn = self._connect(check_same_thread=False)
+            conn.execute('PRAGMA query_only=ON')
+        except Exception:
+            with self._read_pool_lock:
+                self._read_conns_opened -= 1
+            raise
+        return conn
 
-    def get_connection(self):
-        if not hasattr(self._local, 'conn') or self._local.conn is None:
-            self._local.conn = sqlite3.connect(self.db_path)
-            self._local.conn.row_factory = sqlite3.Row
-        return self._local.conn
+    def _get_writer(self):
+        """Return the shared writer connection. Caller must hold _writer_lock."""
+        if self._writer_conn is None:
+            # Implicit transactions start with BEGIN IMMEDIATE: the write lock is
+            # taken up front, so a batch never fails halfway on a lock upgrade
+            self._writer_conn = self._connect(check_same_thread=False, isolation_level='IMMEDIATE')
+        return self._writer_conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into a single commit.
+
+        Writes made inside the block (insert_*, clear_all) join it instead of
+        committing on their own; the outermost block commits on success and
+        rolls everything back on error. Holds the writer lock throughout.
+        """
+        with self._writer_lock:
+            conn = self._get_writer()
+            self._tx_depth += 1
+            self._tx_owner = threading.get_ident()
+            try:
+                yield conn
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._tx_owner = None
+                    conn.rollback()
+                raise
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._tx_owner = None
+                conn.commit()
+                self._maybe_optimize(conn)
+
+    def _maybe_optimize(self, conn: sqlite3.Connection):
+        """Let SQLite refresh planner statistics every OPTIMIZE_INTERVAL seconds, piggybacking on writes."""
+        now = time.monotonic()
+        if now - self._last_optimize >= OPTIMIZE_INTERVAL:
+            self._last_optimize = now
+            conn.execute('PRAGMA optimize')
 
     def init_db(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            # WAL lets readers proceed during a write and needs fewer fsyncs per commit
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS detections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_analysis_id INTEGER,
+                    url TEXT NOT NULL,
+                    source_ip TEXT,
+                    timestamp TEXT,
+                    attack_type TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    pattern_matched TEXT,
+                    confidence_score INTEGER,
+                    detected_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS file_analysis (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    upload_time TEXT NOT NULL,
+                    total_attacks_detected INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS detections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_analysis_id INTEGER,
-                url TEXT NOT NULL,
-                source_ip TEXT,
-                timestamp TEXT,
-                attack_type TEXT NOT NULL,
-                severity TEXT NOT NULL,
-                pattern_matched TEXT,
-                confidence_score INTEGER,
-                detected_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS file_analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_name TEXT NOT NULL,
-                file_type TEXT NOT NULL,
-                upload_time TEXT NOT NULL,
-                total_attacks_detected INTEGER NOT NULL DEFAULT 0
-            )
-        ''')
-
-        # Migration: add confidence_score if missing (e.g. existing DBs)
-        cursor.execute("PRAGMA table_info(detections)")
-        cols = [row[1] for row in cursor.fetchall()]
-        if 'confidence_score' not in cols:
-            cursor.execute("ALTER TABLE detections ADD COLUMN confidence_score INTEGER")
-        if 'file_analysis_id' not in cols:
-            cursor.execute("ALTER TABLE detections ADD COLUMN file_analysis_id INTEGER REFERENCES file_analysis(id)")
-
-        conn.commit()
+            # Migration: add confidence_score if missing (e.g. existing DBs)
+            cursor.execute("PRAGMA table_info(detections)")
+            cols = [row[1] for row in cursor.fetchall()]
+            if 'confidence_score' not in cols:
+                cursor.execute("ALTER TABLE detections ADD COLUMN confidence_score INTEGER")
+            if 'file_analysis_id' not in cols:
+                cursor.execute("ALTER TABLE detections ADD COLUMN file_analysis_id INTEGER REFERENCES file_analysis(id)")
+
+            # Indexes for the filter/sort columns used by the dashboard and export queries
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_det_type ON detections(attack_type)')
+            # Time indexes are ascending: read backwards they give the listing order
+            # (detected_at DESC, id DESC) without a sort. (source_ip, detected_at)
+            # serves both IP lookups and their newest-first ordering.
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_det_ip_recent ON detections(source_ip, detected_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_det_recent ON detections(detected_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_det_fa ON detections(file_analysis_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_det_sev_recent ON detections(severity, detected_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_fa_time ON file_analysis(upload_time DESC)')
+
+            # Gather planner statistics once so the indexes above are picked up;
+            # afterwards PRAGMA optimize keeps them current
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                cursor.execute('ANALYZE')
 
     def insert_detection(self, detection: Dict, file_analysis_id: Optional[int] = None):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO detections (file_analysis_id, url, source_ip, timestamp, attack_type, severity, pattern_matched, confidence_score)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            file_analysis_id,
-            detection.get('url', ''),
-            detection.get('source_ip', 'Unknown'),
-            detection.get('timestamp', ''),
-            detection.get('attack_type', ''),
-            detection.get('severity', 'Medium'),
-            detection.get('pattern_matched', ''),
-            detection.get('confidence_score'),
-        ))
-        conn.commit()
+        """
+        Insert one detection without waiting for the commit (live/per-request path).
+
+        The row is queued and written by a background thread together with other
+        queued rows, so the caller never blocks on an fsync; call flush() when it
+        must be visible to reads (flush() also reports rows that failed to write).
+        Inside transaction() the row joins that transaction instead.
+        """
+        params = _detection_params(detection, file_analysis_id)
+        if self._tx_owner == threading.get_ident():
+            self._get_writer().execute(_INSERT_DETECTION_SQL, params)
+            return
+        self._start_writer_thread()
+        self._write_queue.put(params)
+
+    def flush(self):
+        """
+        Block until every detection queued by insert_detection has been committed.
+        Must not be called inside transaction(): the background writer needs the lock.
+
+        Raises RuntimeError if the background writer failed to commit any queued
+        rows since the last flush(); those rows are lost.
+        """
+        if self._tx_owner == threading.get_ident():
+            raise RuntimeError('flush() cannot be called inside transaction()')
+        error, lost = self._drain_write_queue()
+        if error is not None:
+            raise RuntimeError(f'{lost} queued detection(s) could not be written') from error
+
+    def _drain_write_queue(self) -> tuple:
+        """
+        Wait for the background writer to finish everything queued, then return
+        and reset (first write error, rows lost) since the last drain.
+        """
+        if self._writer_thread is None:
+            return None, 0
+        self._write_queue.join()
+        with self._writer_thread_lock:
+            error, lost = self._write_error, self._write_errors_lost
+            self._write_error, self._write_errors_lost = None, 0
+        return error, lost
+
+    def _start_writer_thread(self):
+        if self._writer_thread is not None:
+            return
+        with self._writer_thread_lock:
+            if self._writer_thread is None:
+                thread = threading.Thread(target=self._writer_loop, name='detections-writer', daemon=True)
+                thread.start()
+                # Daemon threads are stopped abruptly at exit; commit what is still queued first
+                atexit.register(self.flush)
+                self._writer_thread = thread
+
+    def _writer_loop(self):
+        q = self._write_queue
+        while True:
+            rows = [q.get()]
+            deadline = time.monotonic() + WRITE_BATCH_WAIT
+            while len(rows) < WRITE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                with self.transaction() as conn:
+                    conn.executemany(_INSERT_DETECTION_SQL, rows)
+            except Exception as e:
+                logger.exception('Failed to write %d queued detection(s)', len(rows))
+                # Reported to the next flush() caller
+                with self._writer_thread_lock:
+                    if self._write_error is None:
+                        self._write_error = e
+                    self._write_errors_lost += len(rows)
+            finally:
+                for _ in rows:
+                    q.task_done()
+
+    def insert_detections_bulk(self, detections: Iterable[Dict], file_analysis_id: Optional[int] = None):
+        """Insert many detections in one transaction (single commit instead of one per row)."""
+        rows = [_detection_params(d, file_analysis_id) for d in detections]
+        with self.transaction() as conn:
+            conn.executemany(_INSERT_DETECTION_SQL, rows)
 
     def insert_file_analysis(self, file_name: str, file_type: str, total_attacks: int) -> int:
         """Insert file analysis record and return its id for linking detections."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO file_analysis (file_name, file_type, upload_time, total_attacks_detected)
-            VALUES (?, ?, ?, ?)
-        ''', (file_name, file_type, datetime.utcnow().isoformat() + 'Z', total_attacks))
-        conn.commit()
-        return cursor.lastrowid
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO file_analysis (file_name, file_type, upload_time, total_attacks_detected)
+                VALUES (?, ?, ?, ?)
+            ''', (file_name, file_type, datetime.utcnow().isoformat() + 'Z', total_attacks))
+            return cursor.lastrowid
 
     def get_detections(self, attack_type: Optional[str] = None, source_ip: Optional[str] = None,
-                       file_id: Optional[int] = None, severity: Optional[str] = None) -> List[Dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        query = 'SELECT * FROM detections WHERE 1=1'
-        params = []
-        if attack_type:
-            query += ' AND attack_type = ?'
-            params.append(attack_type)
-        if source_ip:
-            query += ' AND source_ip = ?'
-            params.append(source_ip)
-        if file_id is not None:
-            query += ' AND file_analysis_id = ?'
-            params.append(file_id)
-        if severity:
-            query += ' AND severity = ?'
-            params.append(severity)
-        query += ' ORDER BY detected_at DESC'
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [_row_to_detection(row) for row in rows]
+                       file_id: Optional[int] = None, severity: Optional[str] = None,
+                       limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """
+        Return detections matching the filters, newest first. With limit, only
+        that page (at most limit rows after offset) is returned.
+        """
+        where, params = _detection_filters(attack_type, source_ip, file_id, severity)
+        # LIMIT -1 is SQLite's "no limit"
+        return self._read_detection_batch(where, params, None, -1 if limit is None else limit, offset)
+
+    def count_detections(self, attack_type: Optional[str] = None, source_ip: Optional[str] = None,
+                         file_id: Optional[int] = None, severity: Optional[str] = None) -> int:
+        """Number of detections matching the filters (the total across all pages)."""
+        where, params = _detection_filters(attack_type, source_ip, file_id, severity)
+        with self.reader() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM detections{where}', params).fetchone()[0]
+
+    def iter_detections(self, attack_type: Optional[str] = None, source_ip: Optional[str] = None,
+                        file_id: Optional[int] = None, severity: Optional[str] = None,
+                        limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict]:
+        """
+        Yield detections matching the filters, newest first, for streaming
+        exports. With no limit, all matching rows are yielded.
+
+        Rows are read EXPORT_BATCH_ROWS at a time, each batch on a briefly
+        borrowed pooled connection, so a slow download never holds a read
+        connection while the server waits on the client. The first batch is
+        read before this returns, so a busy pool (DatabaseBusyError) is raised
+        to the caller instead of in the middle of the response.
+        """
+        where, params = _detection_filters(attack_type, source_ip, file_id, severity)
+        size = EXPORT_BATCH_ROWS if limit is None else min(EXPORT_BATCH_ROWS, limit)
+        batch = self._read_detection_batch(where, params, None, size, offset)
+        return self._iter_detection_batches(where, params, batch, size, limit)
+
+    def _iter_detection_batches(self, where: str, params: list, batch: List[Dict],
+                                size: int, limit: Optional[int]) -> Iterator[Dict]:
+        remaining = limit
+        while batch:
+            yield from batch
+            if len(batch) < size:
+                return
+            if remaining is not None:
+                remaining -= len(batch)
+                if remaining <= 0:
+                    return
+                size = min(EXPORT_BATCH_ROWS, remaining)
+            batch = self._read_detection_batch(where, params, batch[-1], size, 0)
+
+    def _read_detection_batch(self, where: str, params: list, after: Optional[Dict],
+                              size: int, offset: int) -> List[Dict]:
+        """
+        Read up to size detections in listing order, skipping offset rows. With
+        after (the last row of the previous batch), continue right behind it.
+        """
+        params = list(params)
+        if after is not None:
+            # Keyset continuation for ORDER BY detected_at DESC, id DESC (NULLs sort last)
+            if after['detected_at'] is None:
+                after_cond = 'detected_at IS NULL AND id < ?'
+                params.append(after['id'])
+            else:
+                after_cond = '(detected_at < ? OR (detected_at = ? AND id < ?) OR detected_at IS NULL)'
+                params.extend([after['detected_at'], after['detected_at'], after['id']])
+            where = f'{where} AND {after_cond}' if where else f' WHERE {after_cond}'
+        # id breaks ties between rows inserted in the same second, so batches and pages are stable
+        query = (f'SELECT {", ".join(DETECTION_FIELDS)} FROM detections{where} '
+                 'ORDER BY detected_at DESC, id DESC LIMIT ? OFFSET ?')
+        params.extend([size, offset])
+        with self.reader() as conn:
+            return [_row_to_detection(row) for row in conn.execute(query, params)]
 
     def get_file_analysis_history(self) -> List[Dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, file_name, file_type, upload_time, total_attacks_detected
-            FROM file_analysis ORDER BY upload_time DESC LIMIT 50
-        ''')
-        return [
-            {
-                'id': row['id'],
-                'file_name': row['file_name'],
-                'file_type': row['file_type'],
-                'upload_time': row['upload_time'],
-                'total_attacks_detected': row['total_attacks_detected'],
-            }
-            for row in cursor.fetchall()
-        ]
+        with self.reader() as conn:
+            cursor = conn.execute('''
+                SELECT id, file_name, file_type, upload_time, total_attacks_detected
+                FROM file_analysis ORDER BY upload_time DESC LIMIT 50
+            ''')
+            return [dict(row) for row in cursor]
 
     def get_statistics(self, file_id: Optional[int] = None, severity: Optional[str] = None) -> Dict:
-        """Get detection statistics. If file_id or severity is set, filter accordingly."""
-        conn = self.get_connection()
+        """
+        Get detection statistics. If file_id or severity is set, filter accordingly.
+
+        Results are reused for up to STATS_CACHE_TTL seconds as long as no
+        detection has been added (MAX(id) unchanged), so frequent dashboard
+        polls do not re-run the aggregation. Callers must not modify the result.
+        """
+        key = (file_id, severity)
+        with self.reader() as conn:
+            max_id = conn.execute('SELECT MAX(id) FROM detections').fetchone()[0]
+            now = time.monotonic()
+            with self._stats_lock:
+                cached = self._stats_cache.get(key)
+            if cached is not None and cached[0] > now and cached[1] == max_id:
+                return cached[2]
+
+            stats = self._compute_statistics(conn, file_id, severity)
+        with self._stats_lock:
+            if len(self._stats_cache) >= STATS_CACHE_MAX_ENTRIES:
+                self._stats_cache = {k: v for k, v in self._stats_cache.items() if v[0] > now}
+            self._stats_cache[key] = (now + STATS_CACHE_TTL, max_id, stats)
+        return stats
+
+    def _compute_statistics(self, conn: sqlite3.Connection, file_id: Optional[int],
+                            severity: Optional[str]) -> Dict:
         cursor = conn.cursor()
-        conditions = []
-        params = []
-        if file_id is not None:
-            conditions.append('file_analysis_id = ?')
-            params.append(file_id)
-        if severity:
-            conditions.append('severity = ?')
-            params.append(severity)
-        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
-
-        cursor.execute(f'SELECT COUNT(*) as total FROM detections {where}', params)
-        total = cursor.fetchone()['total']
+        where, params = _detection_filters(None, None, file_id, severity)
 
+        # One grouped scan; totals, per-type, per-severity and per-IP counts are
+        # all folded from its rows instead of re-scanning the table per metric
         cursor.execute(f'''
-            SELECT attack_type, COUNT(*) as count FROM detections {where}
-            GROUP BY attack_type ORDER BY count DESC
+            SELECT attack_type, severity, source_ip, COUNT(*) as count FROM detections{where}
+            GROUP BY attack_type, severity, source_ip
         ''', params)
-        by_attack_type = {row['attack_type']: row['count'] for row in cursor.fetchall()}
 
+        total = 0
+        by_attack_type: Dict[str, int] = {}
         # Severity order: High, Medium, Low (High = highest severity; Low = lowest/informational)
-        cursor.execute(f'''
-            SELECT severity, COUNT(*) as count FROM detections {where}
-            GROUP BY severity
-        ''', params)
-        severity_rows = cursor.fetchall()
         severity_order = ('High', 'Medium', 'Low')
         by_severity = {s: 0 for s in severity_order}
-        for row in severity_rows:
-            s = row['severity']
-            if s in by_severity:
-                by_severity[s] = row['count']
-            else:
-                by_severity[s] = row['count']
-
-        top_conditions = ["source_ip != 'Unknown'"]
-        top_params = []
-        if file_id is not None:
-            top_conditions.append('file_analysis_id = ?')
-            top_params.append(file_id)
-        if severity:
-            top_conditions.append('severity = ?')
-            top_params.append(severity)
-        top_where = 'WHERE ' + ' AND '.join(top_conditions)
-        cursor.execute(f'''
-            SELECT source_ip, COUNT(*) as count FROM detections {top_where}
-            GROUP BY source_ip ORDER BY count DESC LIMIT 10
-        ''', top_params)
-        top_source_ips = [{'ip': row['source_ip'], 'count': row['count']} for row in cursor.fetchall()]
+        ip_counts: Dict[str, int] = {}
+        for row in cursor.fetchall():
+            count = row['count']
+            total += count
+            by_attack_type[row['attack_type']] = by_attack_type.get(row['attack_type'], 0) + count
+            by_severity[row['severity']] = by_severity.get(row['severity'], 0) + count
+            ip = row['source_ip']
+            if ip is not None and ip != 'Unknown':
+                ip_counts[ip] = ip_counts.get(ip, 0) + count
+
+        by_attack_type = dict(sorted(by_attack_type.items(), key=itemgetter(1), reverse=True))
+        top_source_ips = [
+            {'ip': ip, 'count': count}
+            for ip, count in heapq.nlargest(10, ip_counts.items(), key=itemgetter(1))
+        ]
 
         return {
             'total_detections': total,
@@ -193,26 +483,67 @@ class Database:
 
     def clear_all(self):
         """Delete all detections and file history, and reset auto-increment IDs."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM detections')
-        cursor.execute('DELETE FROM file_analysis')
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name='detections'")
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name='file_analysis'")
-        conn.commit()
+        # Queued detections predate the clear, so they must not survive it. Rows
+        # the writer failed to store would be deleted now anyway: not an error here.
+        if self._tx_owner == threading.get_ident():
+            raise RuntimeError('clear_all() cannot be called inside transaction()')
+        error, lost = self._drain_write_queue()
+        if error is not None:
+            logger.warning('Discarding %d queued detection(s) that failed to write before clear: %s',
+                           lost, error)
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM detections')
+            cursor.execute('DELETE FROM file_analysis')
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name='detections'")
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name='file_analysis'")
+        # IDs restart after the reset, so MAX(id) alone cannot tell the cache is stale
+        with self._stats_lock:
+            self._stats_cache.clear()
+
+
+def _detection_filters(attack_type: Optional[str], source_ip: Optional[str],
+                       file_id: Optional[int], severity: Optional[str]) -> tuple:
+    """Return (WHERE clause, params) for the detection list filters."""
+    conditions = []
+    params = []
+    if attack_type:
+        conditions.append('attack_type = ?')
+        params.append(attack_type)
+    if source_ip:
+        conditions.append('source_ip = ?')
+        params.append(source_ip)
+    if file_id is not None:
+        conditions.append('file_analysis_id = ?')
+        params.append(file_id)
+    if severity:
+        conditions.append('severity = ?')
+        params.append(severity)
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return where, params
+
+
+def _detection_params(detection: Dict, file_analysis_id: Optional[int]) -> tuple:
+    return (
+        file_analysis_id,
+        detection.get('url', ''),
+        detection.get('source_ip', 'Unknown'),
+        detection.get('timestamp', ''),
+        detection.get('attack_type', ''),
+        detection.get('severity', 'Medium'),
+        detection.get('pattern_matched', ''),
+        detection.get('confidence_score'),
+    )
+
+
+# Column order of detection exports; confidence_score is last because it is optional
+DETECTION_FIELDS = ['id', 'url', 'source_ip', 'timestamp', 'attack_type', 'severity',
+                    'pattern_matched', 'detected_at', 'confidence_score']
 
 
 def _row_to_detection(row) -> Dict:
-    d = {
-        'id': row['id'],
-        'url': row['url'],
-        'source_ip': row['source_ip'],
-        'timestamp': row['timestamp'],
-        'attack_type': row['attack_type'],
-        'severity': row['severity'],
-        'pattern_matched': row['pattern_matched'],
-        'detected_at': row['detected_at'],
-    }
-    if 'confidence_score' in row.keys() and row['confidence_score'] is not None:
-        d['confidence_score'] = row['confidence_score']
+    """Convert a row selected with DETECTION_FIELDS; confidence_score is omitted when unset."""
+    d = dict(row)
+    if d['confidence_score'] is None:
+        del d['confidence_score']
     return d
@@ -17,10 +17,11 @@ Extension notes:
 """
 
 from urllib.parse import unquote
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+import functools
 import re
 
-from patterns import ATTACK_PATTERNS
+from patterns import ATTACK_PATTERNS, ATTACK_LITERALS, ATTACK_CHECKS
 
 # Detection priority: first match wins. Command Injection checked before SQL
 # so semicolon+command is not misclassified as SQL Injection.
@@ -31,45 +32,124 @@ PRIORITY_ORDER = [
     ("sql_injection", "SQL Injection", "High"),
 ]
 
+# All tiers in check order, ending with the low-severity fallback (suspicious
+# but incomplete, confidence capped at 50): (key, attack_type, severity, max confidence)
+_DETECTION_TIERS = tuple(
+    (key, attack_type, severity, 100) for key, attack_type, severity in PRIORITY_ORDER
+) + (("low_severity", "Suspicious Activity", "Low", 50),)
+
+
+# Verdicts of up to CLASSIFY_CACHE_SIZE distinct URLs are memoized. Longer URLs
+# than CLASSIFY_CACHE_MAX_URL are classified uncached: the cache is bounded by
+# entry count, so attacker-sized URLs would otherwise make its memory unbounded.
+CLASSIFY_CACHE_SIZE = 16384
+CLASSIFY_CACHE_MAX_URL = 4096
+
+
+def _combine_patterns(pattern_list: List) -> re.Pattern:
+    """
+    Join a category's patterns into one alternation that matches wherever any
+    of them does, so a category costs a single scan. Each pattern keeps its
+    own case-sensitivity via a scoped inline flag.
+    """
+    parts = []
+    for pat in pattern_list:
+        flags = 'i' if pat.flags & re.IGNORECASE else '-i'
+        parts.append(f'(?{flags}:{pat.pattern})')
+    return re.compile('|'.join(parts))
+
+
+# One combined regex per category; an individual pattern can only match if its
+# category's combined regex does. Invalid rules fail here, at import time.
+_CATEGORY_REGEX = {
+    key: _combine_patterns(pattern_list)
+    for key, pattern_list in ATTACK_PATTERNS.items() if pattern_list
+}
+
+# Every rule of every category in one regex, plus every literal and check: a
+# URL that matches nothing (most traffic) is rejected after a single scan
+# instead of one per category. Each category is a named group, so match.lastgroup tells
+# which category produced the leftmost match. Groups are in priority order:
+# when several categories match at that position, the highest one is named,
+# and a first-tier hit needs no further checks.
+_ANY_ATTACK_REGEX = re.compile('|'.join(
+    f'(?P<{key}>{_CATEGORY_REGEX[key].pattern})'
+    for key, _, _, _ in _DETECTION_TIERS if key in _CATEGORY_REGEX
+))
+_ALL_LITERALS = tuple(lit for literals in ATTACK_LITERALS.values() for lit in literals)
+_ALL_CHECKS = tuple(check for checks in ATTACK_CHECKS.values() for check in checks)
+
+# Characters at least one of which every pattern of the category needs, so the
+# category's regexes cannot match a URL without them. A character class search
+# is a single fast scan; when it fails the category's regexes are skipped.
+# Keep these in sync with patterns.py when rules are added.
+_REQUIRED_CHARS = {
+    "command_injection": re.compile(r'[;&|$`]'),  # separators, $( and backticks
+    "directory_traversal": re.compile(r'\.\.'),  # every regex rule starts with ..
+    "xss": re.compile(r'[<:=(.]'),  # tags, scheme:, handler=, alert(, document.cookie
+    "sql_injection": re.compile(r"[=';\s]"),  # or 1=1, quote/semicolon comments, keyword\s+keyword
+}
+
+
+def _count_matches(decoded: str, attack_key: str, known_match: bool = False) -> int:
+    """
+    Return number of the category's literals, checks and patterns that match the
+    decoded URL (0 means the category does not match). The individual
+    patterns are only run once the category's combined regex has matched;
+    known_match=True skips that check when a pattern is already known to match.
+    """
+    count = 0
+    for lit in ATTACK_LITERALS.get(attack_key, ()):
+        if lit in decoded:
+            count += 1
+    for check in ATTACK_CHECKS.get(attack_key, ()):
+        if check(decoded):
+            count += 1
+    if known_match:
+        gate_passed = True
+    else:
+        required = _REQUIRED_CHARS.get(attack_key)
+        if required is not None and not required.search(decoded):
+            return count
+        combined = _CATEGORY_REGEX.get(attack_key)
+        gate_passed = combined is not None and combined.search(decoded) is not None
+    if gate_passed:
+        for pat in ATTACK_PATTERNS[attack_key]:
+            if pat.search(decoded):
+                count += 1
+    return count
+
 
 def _decode_url(url: str) -> str:
     """Decode percent-encoded URL for analysis. Handles multiple decoding passes."""
     if not url:
         return ""
     decoded = url
+    # Three passes so triple-encoded payloads (%25252e) are still caught;
+    # stop as soon as no escape is left (the common, unencoded case)
     for _ in range(3):  # limit iterations for nested encoding
-        try:
-            next_decoded = unquote(decoded)
-            if next_decoded == decoded:
-                break
-            decoded = next_decoded
-        except Exception:
+        if '%' not in decoded:
             break
+        # unquote never raises on str input (invalid escapes are kept, bad UTF-8 is replaced)
+        next_decoded = unquote(decoded)
+        if next_decoded == decoded:
+            break
+        decoded = next_decoded
     return decoded
 
 
-def _count_matches(decoded: str, pattern_list: List) -> int:
-    """Return number of patterns that match the decoded URL."""
-    count = 0
-    for pat in pattern_list:
-        if pat.search(decoded):
-            count += 1
-    return count
-
-
-def _compute_confidence(decoded: str, raw_url: str, pattern_list: List, attack_key: str) -> int:
+def _compute_confidence(matches: int, encoded: bool, attack_key: str) -> int:
     """
-    Compute confidence score 0-100.
+    Compute confidence score 0-100 from the number of matched indicators.
     - More matched indicators => higher score.
     - Encoded payload (raw != decoded) can indicate intentional obfuscation => slightly higher.
     """
-    matches = _count_matches(decoded, pattern_list)
     if matches == 0:
         return 0
     # Base from number of patterns matched (cap at 4 for scaling)
     base = min(matches * 25, 85)
     # Bonus if payload was encoded (obfuscation often means malicious intent)
-    encoded_bonus = 10 if raw_url != decoded and attack_key != "low_severity" else 0
+    encoded_bonus = 10 if encoded and attack_key != "low_severity" else 0
     return min(100, base + encoded_bonus)
 
 
@@ -87,36 +167,53 @@ def detect_attack(url: str) -> Optional[Dict]:
 
     SQL Injection is not reported if the URL was already classified as Command Injection or XSS,
     to avoid semicolon/shell confusion and overlapping categories.
+
+    Results are memoized per URL up to CLASSIFY_CACHE_MAX_URL characters, so
+    repeated URLs from scanners, crawlers and health checks skip decoding and
+    matching. Each call returns a new dict, so callers may modify it.
     """
     if url is None or (isinstance(url, str) and not url.strip()):
         return None
 
-    raw_url = url.strip()
+    url = url.strip()
+    if len(url) <= CLASSIFY_CACHE_MAX_URL:
+        verdict = _classify_cached(url)
+    else:
+        verdict = _classify(url)
+    if verdict is None:
+        return None
+    attack_type, severity, confidence = verdict
+    return {
+        "attack_type": attack_type,
+        "severity": severity,
+        "confidence_score": confidence,
+    }
+
+
+def _classify(raw_url: str) -> Optional[Tuple[str, str, int]]:
+    """Return (attack_type, severity, confidence_score) for a stripped URL, or None."""
     decoded = _decode_url(raw_url)
 
     if not decoded:
         return None
+    m = _ANY_ATTACK_REGEX.search(decoded)
+    # Category known to match from the single scan. Categories of higher
+    # priority may match too (further right), so those are still checked.
+    known = m.lastgroup if m else None
+    if (known is None and not any(lit in decoded for lit in _ALL_LITERALS)
+            and not any(check(decoded) for check in _ALL_CHECKS)):
+        return None
 
-    for key, attack_type, severity in PRIORITY_ORDER:
-        pattern_list = ATTACK_PATTERNS.get(key, [])
-        for pat in pattern_list:
-            if pat.search(decoded):
-                confidence = _compute_confidence(decoded, raw_url, pattern_list, key)
-                return {
-                    "attack_type": attack_type,
-                    "severity": severity,
-                    "confidence_score": confidence,
-                }
-
-    # Low severity: only if no high/medium match
-    low_list = ATTACK_PATTERNS.get("low_severity", [])
-    for pat in low_list:
-        if pat.search(decoded):
-            confidence = _compute_confidence(decoded, raw_url, low_list, "low_severity")
-            return {
-                "attack_type": "Suspicious Activity",
-                "severity": "Low",
-                "confidence_score": min(confidence, 50),
-            }
+    encoded = raw_url != decoded
+    # Matching and counting are one pass per category: the count is both the
+    # "did it match" test and the input to the confidence score. Low severity
+    # is last, so it only applies when no high/medium tier matched.
+    for key, attack_type, severity, max_confidence in _DETECTION_TIERS:
+        matches = _count_matches(decoded, key, known_match=key == known)
+        if matches:
+            return attack_type, severity, min(_compute_confidence(matches, encoded, key), max_confidence)
 
     return None
+
+
+_classify_cached = functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(_classify)
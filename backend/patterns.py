@@ -13,7 +13,7 @@ Extension notes:
 """
 
 import re
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List
 
 # ---------------------------------------------------------------------------
 # ATTACK_PATTERNS: Compiled regex patterns per category.
@@ -37,22 +37,19 @@ ATTACK_PATTERNS: Dict[str, Any] = {
     ],
 
     # Directory traversal (includes path traversal): ../, ..\, encoded variants.
+    # Plain ../, ..\, /etc/passwd and /etc/shadow are in ATTACK_LITERALS.
     "directory_traversal": [
-        re.compile(r'\.\./'),
-        re.compile(r'\.\.\\'),
         re.compile(r'\.\.%2[fF]'),
         re.compile(r'\.\.%5[cC]'),
         re.compile(r'\.\.%252[fF]'),
         re.compile(r'\.\.%255[cC]'),
         re.compile(r'(\.\./){2,}'),   # repeated traversal
         re.compile(r'(\.\.\\){2,}'),
-        re.compile(r'/etc/passwd'),
-        re.compile(r'/etc/shadow'),
     ],
 
     # Cross-Site Scripting: script tags, javascript:, event handlers.
     "xss": [
-        re.compile(r'<script\s*[^>]*>', re.IGNORECASE),
+        re.compile(r'<script[^>]*>', re.IGNORECASE),
         re.compile(r'javascript\s*:', re.IGNORECASE),
         re.compile(r'onerror\s*=', re.IGNORECASE),
         re.compile(r'onload\s*=', re.IGNORECASE),
@@ -68,15 +65,19 @@ ATTACK_PATTERNS: Dict[str, Any] = {
 
     # SQL Injection: classic payloads. Not applied if URL already matched
     # Command Injection or XSS (handled in detector to avoid semicolon/shell confusion).
+    # Optional leading/trailing parts (e.g. '?\s* before "or") are left out: they
+    # cannot change whether a search matches, but an optional prefix makes the
+    # engine retry it at every position, which is quadratic on long whitespace runs.
     "sql_injection": [
-        re.compile(r"'?\s*or\s*1\s*=\s*1\s*['\"]?", re.IGNORECASE),
-        re.compile(r"'?\s*or\s*['\"]?a['\"]?\s*=\s*['\"]?a['\"]?", re.IGNORECASE),
+        re.compile(r"or\s*1\s*=\s*1", re.IGNORECASE),
+        re.compile(r"or\s*['\"]?a['\"]?\s*=\s*['\"]?a", re.IGNORECASE),
         re.compile(r"'\s*--", re.IGNORECASE),
         re.compile(r'union\s+select', re.IGNORECASE),
-        re.compile(r'select\s+.*\s+from\s+', re.IGNORECASE),
-        re.compile(r'insert\s+into\s+', re.IGNORECASE),
-        re.compile(r'delete\s+from\s+', re.IGNORECASE),
-        re.compile(r'drop\s+table\s+', re.IGNORECASE),
+        # select ... from is in ATTACK_CHECKS: as a regex it rescans the rest of
+        # the URL from every "select" token
+        re.compile(r'insert\s+into\s', re.IGNORECASE),
+        re.compile(r'delete\s+from\s', re.IGNORECASE),
+        re.compile(r'drop\s+table\s', re.IGNORECASE),
         re.compile(r';\s*--', re.IGNORECASE),  # SQL comment after semicolon
     ],
 
@@ -86,6 +87,72 @@ ATTACK_PATTERNS: Dict[str, Any] = {
         re.compile(r"%27|'"),  # single quote or encoded
         re.compile(r'\b(union|select|or|and)\b', re.IGNORECASE),  # SQL keywords alone
         re.compile(r'<\s*script', re.IGNORECASE),  # malformed script tag
-        re.compile(r'=\s*[\'"][^"\']*[\'"]\s*or\s*', re.IGNORECASE),  # partial SQL
+        re.compile(r'=\s*[\'"][^"\']*[\'"]\s*or', re.IGNORECASE),  # partial SQL
+    ],
+}
+
+# ---------------------------------------------------------------------------
+# ATTACK_LITERALS: Indicators that are fixed strings, checked with a plain
+# case-sensitive substring test instead of the regex engine. Each literal
+# counts as one matched indicator of its category, like a pattern.
+# ---------------------------------------------------------------------------
+
+ATTACK_LITERALS: Dict[str, List[str]] = {
+    "directory_traversal": [
+        '../',
+        '..\\',
+        '/etc/passwd',
+        '/etc/shadow',
+    ],
+}
+
+
+# ---------------------------------------------------------------------------
+# ATTACK_CHECKS: Indicators tested by a function instead of a regex, where the
+# regex form has no linear-time equivalent under the re module. Each check
+# counts as one matched indicator of its category, like a pattern.
+# ---------------------------------------------------------------------------
+
+_SELECT_WS = re.compile(r'select\s', re.IGNORECASE)
+_WS_RUN = re.compile(r'\s*')
+_FROM_WS = re.compile(r'from\s', re.IGNORECASE)
+_WS_FROM_WS = re.compile(r'\sfrom\s', re.IGNORECASE)
+_WS_RUN_FROM_WS = re.compile(r'\s+from\s', re.IGNORECASE)
+
+
+def has_select_from(text: str) -> bool:
+    """
+    True exactly where select\s+.*\s+from\s (case-insensitive) would match:
+    "select", whitespace, any text without a line break, whitespace, "from",
+    whitespace. The column list may be of any length.
+
+    The regex retries the rest of the line from every "select"; here each
+    line is searched for "from" at most once, so the cost is linear.
+    """
+    searched_to = -1  # end of the last line already searched without a match
+    for m in _SELECT_WS.finditer(text):
+        start = m.end() - 1
+        body = _WS_RUN.match(text, start).end()
+        if body <= searched_to:
+            continue
+        # Only whitespace before "from": it must cover both \s+ (two characters)
+        if body - start >= 2 and _FROM_WS.match(text, body):
+            return True
+        line_end = text.find('\n', body)
+        if line_end == -1:
+            line_end = len(text)
+        # "from" later on the same line...
+        if _WS_FROM_WS.search(text, body, line_end + 1):
+            return True
+        # ...or on a following line, with only whitespace before it
+        if line_end < len(text) and _WS_RUN_FROM_WS.match(text, line_end):
+            return True
+        searched_to = line_end
+    return False
+
+
+ATTACK_CHECKS: Dict[str, List[Callable[[str], bool]]] = {
+    "sql_injection": [
+        has_select_from,
     ],
 }
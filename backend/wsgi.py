@@ -0,0 +1,17 @@
+"""
+WSGI entry point for production servers (see Procfile).
+
+Run with threaded gunicorn workers, e.g.:
+    gunicorn --worker-class gthread --workers 2 --threads 8 wsgi:app
+
+All endpoints are I/O-bound (SQLite, uploads, PCAP/CSV parsing). sqlite3
+releases the GIL while a statement runs, so worker threads overlap real I/O.
+Database lends each request a connection from a bounded read pool and funnels
+all writes through one shared, locked writer connection, so the number of
+open connections stays fixed however many threads gunicorn runs.
+"""
+
+from app import app, db
+
+# `python app.py` initializes the schema in __main__; do the same for WSGI servers.
+db.init_db()
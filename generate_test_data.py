@@ -1,207 +1,234 @@
 """
 Generate real-world style test data: CSV log file and PCAP with HTTP traffic.
-Includes normal traffic, all attack types detected by the URL IDS (including
-low-severity / suspicious activity), and uses Scapy with pcap disabled to avoid
-"No libpcap provider available" on Windows when only writing PCAP files.
+Includes normal traffic and all attack types detected by the URL IDS (including
+low-severity / suspicious activity). The PCAP is written directly in the classic
+libpcap format, so neither Scapy nor a libpcap provider (Npcap on Windows) is
+needed to generate it.
 
 Run from project root: python generate_test_data.py
 """
-import os
-# Disable libpcap so Scapy does not require Npcap on Windows (we only write PCAP).
-os.environ["SCAPY_USE_LIBPCAP"] = "no"
-
 import csv
 import random
+import socket
+import struct
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+CSV_HEADER = ("timestamp", "source_ip", "url")
+# Output file buffer; larger than the 8 KiB default so big runs issue fewer writes
+WRITE_BUFFER = 1 << 17
 
-def generate_csv(out_path: str) -> None:
-    base_ts = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
-    rows = []
+# Classic pcap: little-endian, version 2.4, microsecond timestamps, Ethernet link type
+PCAP_GLOBAL_HEADER = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)
+PCAP_RECORD_HEADER = struct.Struct("<IIII")
+# Ethernet (dst, src, IPv4), then IPv4 and TCP headers without options
+ETHERNET_HEADER = bytes.fromhex("020000000001" "020000000002") + struct.pack("!H", 0x0800)
+IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+TCP_HEADER = struct.Struct("!HHIIBBHHH")
+TCP_FLAGS_PSH_ACK = 0x18
 
-    def add(ip: str, url: str, ts: datetime = None):
-        t = (ts or base_ts) + timedelta(seconds=random.randint(0, 86400))
-        rows.append({
-            "timestamp": t.strftime("%Y-%m-%d %H:%M:%S"),
-            "source_ip": ip,
-            "url": url,
-        })
 
+# CSV traffic classes: (source IPs, URL pool, URLs per IP). Each IP requests a
+# fresh random sample of that many URLs from the pool; None means every URL.
+CSV_TRAFFIC_CLASSES = (
     # --- Legitimate ---
-    ips_legit = ["203.0.113.10", "198.51.100.22", "192.0.2.5", "10.0.0.101", "172.16.1.50"]
-    for ip in ips_legit:
-        add(ip, "/")
-        add(ip, "/index.html")
-        add(ip, "/search?q=hello")
-        add(ip, "/api/users?id=123")
-        add(ip, "/login")
-        add(ip, "/assets/style.css")
-        add(ip, "/products?category=books&page=2")
-
+    (
+        ["203.0.113.10", "198.51.100.22", "192.0.2.5", "10.0.0.101", "172.16.1.50"],
+        [
+            "/",
+            "/index.html",
+            "/search?q=hello",
+            "/api/users?id=123",
+            "/login",
+            "/assets/style.css",
+            "/products?category=books&page=2",
+        ],
+        None,
+    ),
     # --- SQL Injection ---
-    ips_sqli = ["192.168.1.100", "10.0.0.205", "203.0.113.99"]
-    sqli_urls = [
-        "/login?user=admin' OR '1'='1",
-        "/api?id=1; DROP TABLE users--",
-        "/search?q=test' UNION SELECT * FROM users--",
-        "/page?id=1 AND 1=1--",
-        "/item?id=1' OR 1=1#",
-        "/user?name=admin'--",
-        "/?id=1%27%20OR%20%271%27%3D%271",
-    ]
-    for ip in ips_sqli:
-        for url in random.sample(sqli_urls, min(4, len(sqli_urls))):
-            add(ip, url)
-
+    (
+        ["192.168.1.100", "10.0.0.205", "203.0.113.99"],
+        [
+            "/login?user=admin' OR '1'='1",
+            "/api?id=1; DROP TABLE users--",
+            "/search?q=test' UNION SELECT * FROM users--",
+            "/page?id=1 AND 1=1--",
+            "/item?id=1' OR 1=1#",
+            "/user?name=admin'--",
+            "/?id=1%27%20OR%20%271%27%3D%271",
+        ],
+        4,
+    ),
     # --- XSS ---
-    ips_xss = ["198.51.100.77", "192.168.2.33"]
-    xss_urls = [
-        "/search?q=<script>alert(1)</script>",
-        "/comment?text=<img src=x onerror=alert(document.cookie)>",
-        "/profile?name=<svg onload=alert(1)>",
-        "/?ref=javascript:alert(1)",
-        "/page?x=<body onload=alert(1)>",
-        "/search?q=test%22%3E%3Cscript%3Ealert(1)%3C/script%3E",
-    ]
-    for ip in ips_xss:
-        for url in random.sample(xss_urls, min(4, len(xss_urls))):
-            add(ip, url)
-
+    (
+        ["198.51.100.77", "192.168.2.33"],
+        [
+            "/search?q=<script>alert(1)</script>",
+            "/comment?text=<img src=x onerror=alert(document.cookie)>",
+            "/profile?name=<svg onload=alert(1)>",
+            "/?ref=javascript:alert(1)",
+            "/page?x=<body onload=alert(1)>",
+            "/search?q=test%22%3E%3Cscript%3Ealert(1)%3C/script%3E",
+        ],
+        4,
+    ),
     # --- Directory Traversal ---
-    ips_trav = ["10.0.0.50", "172.16.0.100"]
-    trav_urls = [
-        "/download?file=../../../etc/passwd",
-        "/view?path=..%2f..%2f..%2fetc%2fpasswd",
-        "/static/..%252f..%252f..%252fetc/passwd",
-        "/api/file?path=..\\..\\..\\windows\\system32\\config\\sam",
-    ]
-    for ip in ips_trav:
-        for url in trav_urls:
-            add(ip, url)
-
+    (
+        ["10.0.0.50", "172.16.0.100"],
+        [
+            "/download?file=../../../etc/passwd",
+            "/view?path=..%2f..%2f..%2fetc%2fpasswd",
+            "/static/..%252f..%252f..%252fetc/passwd",
+            "/api/file?path=..\\..\\..\\windows\\system32\\config\\sam",
+        ],
+        None,
+    ),
     # --- Command Injection ---
-    ips_cmd = ["203.0.113.55", "192.168.5.10"]
-    cmd_urls = [
-        "/run?cmd=; ls -la",
-        "/exec?command=id",
-        "/api?q=test | cat /etc/passwd",
-        "/run?cmd=; whoami",
-        "/shell?c=&& netstat -an",
-        "/api?x=$(id)",
-    ]
-    for ip in ips_cmd:
-        for url in random.sample(cmd_urls, min(4, len(cmd_urls))):
-            add(ip, url)
-
+    (
+        ["203.0.113.55", "192.168.5.10"],
+        [
+            "/run?cmd=; ls -la",
+            "/exec?command=id",
+            "/api?q=test | cat /etc/passwd",
+            "/run?cmd=; whoami",
+            "/shell?c=&& netstat -an",
+            "/api?x=$(id)",
+        ],
+        4,
+    ),
     # --- Low severity / Suspicious Activity (single quote, keywords alone, malformed) ---
-    ips_low = ["192.168.3.11", "10.0.0.77", "198.51.100.88"]
-    low_urls = [
-        "/search?q=test'",
-        "/api?id=1'",
-        "/page?name=admin'",
-        "/?q=%27",
-        "/filter?order=select",
-        "/query?q=union",
-        "/form?field=and",
-        "/?x=%3C%20script",
-        "/comment?t=' or ",
-        "/view?user=guest'",
-        "/api?sort=select",
-        "/search?q=union",
-    ]
-    for ip in ips_low:
-        for url in random.sample(low_urls, min(5, len(low_urls))):
-            add(ip, url)
+    (
+        ["192.168.3.11", "10.0.0.77", "198.51.100.88"],
+        [
+            "/search?q=test'",
+            "/api?id=1'",
+            "/page?name=admin'",
+            "/?q=%27",
+            "/filter?order=select",
+            "/query?q=union",
+            "/form?field=and",
+            "/?x=%3C%20script",
+            "/comment?t=' or ",
+            "/view?user=guest'",
+            "/api?sort=select",
+            "/search?q=union",
+        ],
+        5,
+    ),
+)
 
+
+def generate_csv(out_path: str) -> None:
+    base_ts = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    # (source_ip, url) pairs; timestamps are drawn for all of them at the end
+    pending = []
+    for ips, pool, k in CSV_TRAFFIC_CLASSES:
+        if k is None:
+            pending.extend((ip, url) for ip in ips for url in pool)
+        else:
+            k = min(k, len(pool))
+            pending.extend((ip, url) for ip in ips for url in random.sample(pool, k))
+
+    # One random offset (0-86400 s) per row, drawn in a single call
+    offsets = random.choices(range(86401), k=len(pending))
+    # (timestamp, source_ip, url), in CSV_HEADER order
+    rows = [
+        ((base_ts + timedelta(seconds=off)).isoformat(sep=" ", timespec="seconds"), ip, url)
+        for off, (ip, url) in zip(offsets, pending)
+    ]
     random.shuffle(rows)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["timestamp", "source_ip", "url"])
-        w.writeheader()
+    with open(out_path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+        w = csv.writer(f)
+        w.writerow(CSV_HEADER)
         w.writerows(rows)
 
     print(f"Written {len(rows)} rows to {out_path}")
 
 
-def generate_pcap(out_path: str) -> None:
-    # Suppress "No libpcap provider available" warning (we only write PCAP, no live capture).
-    import sys
-    _stderr = sys.stderr
-    try:
-        sys.stderr = open(os.devnull, "w")
-        try:
-            from scapy.config import conf
-            conf.use_pcap = False
-        except Exception:
-            pass
-        from scapy.all import Ether, IP, TCP, Raw, wrpcap
-    except ImportError:
-        if sys.stderr != _stderr:
-            sys.stderr.close()
-        sys.stderr = _stderr
-        print("Scapy not found. Install with: pip install scapy")
-        print("Skipping PCAP generation.")
-        return
-    finally:
-        if getattr(sys, "stderr", None) != _stderr:
-            try:
-                sys.stderr.close()
-            except Exception:
-                pass
-        sys.stderr = _stderr
-
-    packets = []
-    server_ip = "192.168.1.100"
-    client_ips = [
-        "203.0.113.10", "198.51.100.22", "192.168.1.50", "10.0.0.101",
-        "172.16.1.20", "192.168.2.100", "203.0.113.55", "198.51.100.77",
-    ]
+def _internet_checksum(data: bytes) -> int:
+    """RFC 1071 ones' complement checksum (IPv4 header, TCP segment)."""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
 
-    def make_http_request(client_ip: str, path_query: str, method: str = "GET"):
-        raw = f"{method} {path_query} HTTP/1.1\r\nHost: example.com\r\nUser-Agent: TestClient/1.0\r\n\r\n"
-        pkt = (
-            Ether(dst="02:00:00:00:00:01", src="02:00:00:00:00:02")
-            / IP(src=client_ip, dst=server_ip)
-            / TCP(sport=random.randint(40000, 65535), dport=80, flags="PA")
-            / Raw(load=raw.encode("utf-8"))
-        )
-        packets.append(pkt)
 
-    # Normal
-    for ip in client_ips[:4]:
-        make_http_request(ip, "/")
-        make_http_request(ip, "/index.html")
-        make_http_request(ip, "/search?q=test")
-        make_http_request(ip, "/api/users?id=1")
+def _http_frame(src_ip: str, dst_ip: str, sport: int, payload: bytes) -> bytes:
+    """Ethernet/IPv4/TCP (PSH+ACK, port 80) frame carrying payload, with valid checksums."""
+    src = socket.inet_aton(src_ip)
+    dst = socket.inet_aton(dst_ip)
+    seg_len = TCP_HEADER.size + len(payload)
+    # Same defaults Scapy uses: IP id 1, TTL 64; TCP seq/ack 0, window 8192
+    tcp = TCP_HEADER.pack(sport, 80, 0, 0, 5 << 4, TCP_FLAGS_PSH_ACK, 8192, 0, 0)
+    pseudo = src + dst + struct.pack("!BBH", 0, socket.IPPROTO_TCP, seg_len)
+    tcp = tcp[:16] + struct.pack("!H", _internet_checksum(pseudo + tcp + payload)) + tcp[18:]
+    ip = IPV4_HEADER.pack(0x45, 0, IPV4_HEADER.size + seg_len, 1, 0, 64, socket.IPPROTO_TCP, 0, src, dst)
+    ip = ip[:10] + struct.pack("!H", _internet_checksum(ip)) + ip[12:]
+    return ETHERNET_HEADER + ip + tcp + payload
 
-    # SQL Injection
-    make_http_request("192.168.1.50", "/login?user=admin' OR '1'='1")
-    make_http_request("10.0.0.101", "/api?id=1; DROP TABLE users--")
-    make_http_request("172.16.1.20", "/search?q=1 UNION SELECT * FROM users")
 
-    # XSS
-    make_http_request("198.51.100.77", "/search?q=<script>alert(1)</script>")
-    make_http_request("192.168.2.100", "/?x=<img src=x onerror=alert(1)>")
+PCAP_SERVER_IP = "192.168.1.100"
+_PCAP_NORMAL_CLIENTS = ["203.0.113.10", "198.51.100.22", "192.168.1.50", "10.0.0.101"]
 
+# (client IP, request path) per generated HTTP GET, in capture order
+PCAP_REQUESTS = (
+    # Normal
+    [(ip, path) for ip in _PCAP_NORMAL_CLIENTS
+     for path in ("/", "/index.html", "/search?q=test", "/api/users?id=1")]
+    # SQL Injection
+    + [
+        ("192.168.1.50", "/login?user=admin' OR '1'='1"),
+        ("10.0.0.101", "/api?id=1; DROP TABLE users--"),
+        ("172.16.1.20", "/search?q=1 UNION SELECT * FROM users"),
+    ]
+    # XSS
+    + [
+        ("198.51.100.77", "/search?q=<script>alert(1)</script>"),
+        ("192.168.2.100", "/?x=<img src=x onerror=alert(1)>"),
+    ]
     # Directory traversal
-    make_http_request("203.0.113.55", "/download?file=../../../etc/passwd")
-    make_http_request("10.0.0.101", "/view?path=..%2f..%2f..%2fetc%2fpasswd")
-
+    + [
+        ("203.0.113.55", "/download?file=../../../etc/passwd"),
+        ("10.0.0.101", "/view?path=..%2f..%2f..%2fetc%2fpasswd"),
+    ]
     # Command injection
-    make_http_request("192.168.1.50", "/run?cmd=; ls -la")
-    make_http_request("172.16.1.20", "/exec?command=id")
-
+    + [
+        ("192.168.1.50", "/run?cmd=; ls -la"),
+        ("172.16.1.20", "/exec?command=id"),
+    ]
     # Low severity / Suspicious Activity
-    make_http_request("192.168.3.11", "/search?q=test'")
-    make_http_request("10.0.0.77", "/api?id=1'")
-    make_http_request("198.51.100.88", "/filter?order=select")
-    make_http_request("192.168.1.50", "/query?q=union")
-    make_http_request("172.16.1.20", "/?q=%27")
-    make_http_request("198.51.100.77", "/comment?t=' or ")
+    + [
+        ("192.168.3.11", "/search?q=test'"),
+        ("10.0.0.77", "/api?id=1'"),
+        ("198.51.100.88", "/filter?order=select"),
+        ("192.168.1.50", "/query?q=union"),
+        ("172.16.1.20", "/?q=%27"),
+        ("198.51.100.77", "/comment?t=' or "),
+    ]
+)
+
+
+def _http_request_frame(client_ip: str, path_query: str, method: str = "GET") -> bytes:
+    raw = f"{method} {path_query} HTTP/1.1\r\nHost: example.com\r\nUser-Agent: TestClient/1.0\r\n\r\n"
+    return _http_frame(client_ip, PCAP_SERVER_IP, random.randint(40000, 65535), raw.encode("utf-8"))
+
+
+def generate_pcap(out_path: str) -> None:
+    # (timestamp, frame bytes) per packet, built in one pass over the table
+    packets = [(time.time(), _http_request_frame(ip, path)) for ip, path in PCAP_REQUESTS]
 
     try:
-        wrpcap(out_path, packets)
+        with open(out_path, "wb", buffering=WRITE_BUFFER) as f:
+            f.write(PCAP_GLOBAL_HEADER)
+            for ts, frame in packets:
+                ts_sec = int(ts)
+                ts_usec = int((ts - ts_sec) * 1_000_000)
+                f.write(PCAP_RECORD_HEADER.pack(ts_sec, ts_usec, len(frame), len(frame)))
+                f.write(frame)
         print(f"Written {len(packets)} packets to {out_path}")
     except Exception as e:
         print(f"Could not write PCAP ({e}). Use test_data.csv for testing.")
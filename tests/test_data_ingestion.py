@@ -0,0 +1,58 @@
+"""
+Tests for CSV ingestion of uploaded files.
+Run from project root:  python -m unittest discover tests
+"""
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from data_ingestion import DataIngestion
+
+
+class CsvUploadTest(unittest.TestCase):
+    def _upload(self, data: bytes):
+        # Werkzeug buffers uploads in a SpooledTemporaryFile; before Python 3.11
+        # it has no readable(), so it cannot be given to TextIOWrapper directly
+        stream = tempfile.SpooledTemporaryFile(max_size=500 * 1024)
+        self.addCleanup(stream.close)
+        stream.write(data)
+        stream.seek(0)
+        return list(DataIngestion().process_csv_upload(stream))
+
+    def test_bare_cr_line_endings(self):
+        rows = self._upload(b"\xef\xbb\xbfsource_ip,url\r1.1.1.1,/a\r2.2.2.2,/b?x=1\r")
+        self.assertEqual([(r["source_ip"], r["url"]) for r in rows],
+                         [("1.1.1.1", "/a"), ("2.2.2.2", "/b?x=1")])
+
+    def test_crlf_line_endings_and_quoted_newline(self):
+        rows = self._upload(b'timestamp,url\r\n"2024-01-01\r\n10:00",/c\r\nt,/d\r\n')
+        self.assertEqual([r["url"] for r in rows], ["/c", "/d"])
+        self.assertEqual(rows[0]["timestamp"], "2024-01-01\r\n10:00")
+
+    def test_stream_with_only_read(self):
+        # What TextIOWrapper would reject: no readable()/readinto(), as on Python < 3.11
+        class ReadOnly:
+            def __init__(self, data):
+                self._data = io.BytesIO(data)
+
+            def read(self, n=-1):
+                return self._data.read(n)
+
+        rows = list(DataIngestion().process_csv_upload(ReadOnly(b"url\r/a\r/b\r")))
+        self.assertEqual([r["url"] for r in rows], ["/a", "/b"])
+
+    def test_upload_stream_left_open(self):
+        stream = tempfile.SpooledTemporaryFile()
+        self.addCleanup(stream.close)
+        stream.write(b"url\n/a\n")
+        stream.seek(0)
+        list(DataIngestion().process_csv_upload(stream))
+        self.assertFalse(stream.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
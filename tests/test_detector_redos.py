@@ -0,0 +1,62 @@
+"""
+Regression tests for catastrophic backtracking (ReDoS) in the detection rules.
+Run from project root:  python -m unittest discover tests
+"""
+import random
+import re
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from detector import _classify, detect_attack
+from patterns import has_select_from
+
+# Generous bound for slow CI machines; the backtracking forms took seconds
+MAX_SECONDS = 0.5
+
+PATHOLOGICAL_URLS = {
+    "spaces after or": "/search?q=or" + " " * 20000,
+    "spaces after union": "/search?q=union" + " " * 20000,
+    "spaces after select": "/search?q=select" + " " * 2000,
+    "select without from": "/search?q=" + "select a " * 2000,
+    "select tokens only": "/search?q=" + "select " * 20000,
+}
+
+
+class DetectorReDoSTest(unittest.TestCase):
+    def test_pathological_inputs_finish_fast(self):
+        for name, url in PATHOLOGICAL_URLS.items():
+            with self.subTest(name):
+                # Call the uncached classifier so every run does the full scan
+                start = time.perf_counter()
+                _classify(url)
+                elapsed = time.perf_counter() - start
+                self.assertLess(elapsed, MAX_SECONDS, f"{name}: {elapsed:.3f}s")
+
+    def test_select_from_still_detected(self):
+        # Only the select ... from rule matches these (no UNION, quote or comment)
+        for url in (
+            "/?q=1; select a,b from users",
+            "/x?q=1; select " + "a" * 250 + " from users",
+            "/x?q=1; select " + "a, " * 5000 + "b from users",
+        ):
+            with self.subTest(url[:40]):
+                result = detect_attack(url)
+                self.assertIsNotNone(result)
+                self.assertEqual(result["attack_type"], "SQL Injection")
+
+    def test_select_from_check_matches_regex(self):
+        # has_select_from must agree with the rule it replaces on every input
+        reference = re.compile(r"select\s+.*\s+from\s", re.IGNORECASE)
+        tokens = ["select", "SELECT", "from", "From", " ", "  ", "\n", "\t", "a", "x,y", "fromm"]
+        rng = random.Random(0)
+        for _ in range(20000):
+            text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(has_select_from(text), bool(reference.search(text)), repr(text))
+
+
+if __name__ == "__main__":
+    unittest.main()